@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from serialization import dump_file, load_file
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(text: str, **params) -> str:
+    key_material = json.dumps(
+        {"text": normalize_text(text), "params": params},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class AIResponseCache:
+    """Persistent cache of validated quiz questions, one JSON file per key.
+
+    Entries are evicted least-recently-used once ``max_entries`` is exceeded,
+    and lazily dropped when older than ``ttl_seconds``.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 500, ttl_seconds: int = 7 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                created_at = os.path.getmtime(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((created_at, filename[:-len(".json")]))
+
+        for created_at, key in sorted(entries):
+            self._index[key] = created_at
+
+        with self._lock:
+            self._evict_overflow()
+
+        logger.info(f"AI response cache loaded {len(self._index)} entries from {self.directory}")
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_overflow(self):
+        while len(self._index) > self.max_entries:
+            oldest_key = next(iter(self._index))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            created_at = self._index.get(key)
+            if created_at is None:
+                self.misses += 1
+                return None
+
+            if self._is_expired(created_at):
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            try:
+                questions = load_file(self._path(key))["questions"]
+            except Exception as e:
+                logger.warning(f"Dropping unreadable AI cache entry {key}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._index.move_to_end(key)
+            self.hits += 1
+            return questions
+
+    def set(self, key: str, questions: List[dict]):
+        with self._lock:
+            filepath = self._path(key)
+            tmp_path = f"{filepath}.tmp"
+            try:
+                dump_file(tmp_path, {"created_at": time.time(), "questions": questions})
+                os.replace(tmp_path, filepath)
+            except Exception as e:
+                logger.error(f"Error writing AI cache entry {key}: {e}")
+                return
+
+            self._index[key] = time.time()
+            self._index.move_to_end(key)
+            self._evict_overflow()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
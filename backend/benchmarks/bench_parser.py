@@ -0,0 +1,108 @@
+"""Micro-benchmark for quiz_parser.parse_questions over benchmarks/corpus.
+
+Compares against the regex/brace-count cascade that generate_quiz_with_ai used
+before, reporting questions recovered and time per parse for each sample.
+
+    python benchmarks/bench_parser.py [--repeat 2000] [--json results.json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_parser import parse_questions
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def legacy_parse(content):
+    if "```json" in content:
+        start_idx = content.find("```json") + len("```json")
+        end_idx = content.find("```", start_idx)
+        json_str = content[start_idx:end_idx].strip() if end_idx != -1 else content[start_idx:].strip()
+    else:
+        json_str = content.strip()
+
+    def parse_multiple_json_objects(text):
+        objects = []
+        try:
+            if text.strip().startswith('[') and text.strip().endswith(']'):
+                return json.loads(text)
+        except Exception:
+            pass
+        current_object = ""
+        brace_count = 0
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            current_object += line
+            brace_count += line.count('{') - line.count('}')
+            if brace_count == 0 and current_object.strip():
+                for candidate in (current_object, re.sub(r',(\s*[}\]])', r'\1', current_object)):
+                    try:
+                        obj = json.loads(candidate)
+                    except Exception:
+                        continue
+                    if isinstance(obj, dict):
+                        objects.append(obj)
+                    elif isinstance(obj, list):
+                        objects.extend(obj)
+                    break
+                current_object = ""
+        return objects
+
+    try:
+        questions_data = parse_multiple_json_objects(json_str)
+    except Exception:
+        questions_data = []
+    if isinstance(questions_data, dict):
+        questions_data = [questions_data]
+    return [q for q in questions_data if isinstance(q, dict) and "question" in q]
+
+
+def time_parser(parser, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser(content)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=2000)
+    arg_parser.add_argument("--json", help="write machine-readable results to this file")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    results = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, filename), 'r', encoding='utf-8') as f:
+            content = f.read()
+        results.append({
+            "sample": filename,
+            "bytes": len(content),
+            "questions": len([q for q in parse_questions(content) if "question" in q]),
+            "legacy_questions": len(legacy_parse(content)),
+            "us_per_parse": round(time_parser(parse_questions, content, args.repeat), 2),
+            "legacy_us_per_parse": round(time_parser(legacy_parse, content, args.repeat), 2)
+        })
+
+    print(f"{'sample':<38}{'bytes':>7}{'found':>7}{'legacy':>8}{'us':>10}{'legacy us':>11}")
+    for r in results:
+        print(f"{r['sample']:<38}{r['bytes']:>7}{r['questions']:>7}{r['legacy_questions']:>8}"
+              f"{r['us_per_parse']:>10}{r['legacy_us_per_parse']:>11}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"benchmark": "parser", "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Offline benchmark suite for the quiz generator backend.
+
+Runs against a local mock OpenRouter server (benchmarks/mock_openrouter.py) in
+a throwaway working directory, so it needs no API key and leaves no files
+behind. Sections:
+
+    extraction   extract_text_from_pdf / extract_text_from_docx on synthetic documents
+    parsing      parse_questions + normalize_question over benchmarks/corpus
+    markdown     render_quiz_markdown
+    leaderboard  save_leaderboard_entry and get_leaderboard
+    endpoints    GET saved quiz, quiz listing and leaderboard responses (serialization path)
+    e2e          POST /api/generate-quiz latency and throughput at several concurrency levels
+
+    python benchmarks/bench_suite.py [--quick] [--only parsing,e2e] [--json results.json]
+"""
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from mock_openrouter import MockOpenRouter, load_corpus, CORPUS_DIR
+from synthetic import make_document_text, make_docx, make_pdf
+
+SECTIONS = ["extraction", "parsing", "markdown", "leaderboard", "endpoints", "e2e"]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def time_call(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3)
+    }
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_extraction(main, quick: bool) -> list:
+    from extraction import extract_text_from_docx, extract_text_from_pdf, read_pdf_text
+
+    repeat = 1 if quick else 3
+    results = []
+    for pages in ((1, 10) if quick else (1, 10, 50)):
+        pdf = make_pdf(pages)
+        text = extract_text_from_pdf(pdf)
+        results.append({"name": f"pdf_{pages}_pages", "bytes": len(pdf), "chars": len(text), **time_call(lambda: extract_text_from_pdf(pdf), repeat)})
+
+    pages = 10 if quick else 50
+    pdf = make_pdf(pages)
+    budget = main.GENERATION_CHUNK_CHARS
+    text = read_pdf_text(pdf, budget)
+    results.append({
+        "name": f"pdf_{pages}_pages_budget_{budget}",
+        "bytes": len(pdf),
+        "chars": len(text),
+        **time_call(lambda: read_pdf_text(pdf, budget), repeat)
+    })
+
+    for paragraphs in ((50, 500) if quick else (50, 500, 5000)):
+        docx = make_docx(paragraphs)
+        text = extract_text_from_docx(docx)
+        results.append({"name": f"docx_{paragraphs}_paragraphs", "bytes": len(docx), "chars": len(text), **time_call(lambda: extract_text_from_docx(docx), repeat)})
+    return results
+
+
+def bench_parsing(main, quick: bool) -> list:
+    from quiz_parser import parse_questions
+
+    def parse_and_repair(content):
+        return [q for q in (main.normalize_question(q) for q in parse_questions(content)) if q is not None]
+
+    repeat = 200 if quick else 2000
+    results = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, filename), 'r', encoding='utf-8') as f:
+            content = f.read()
+        results.append({
+            "name": filename,
+            "bytes": len(content),
+            "questions": len(parse_and_repair(content)),
+            **time_call(lambda: parse_and_repair(content), repeat)
+        })
+    return results
+
+
+def corpus_questions(main) -> list:
+    from quiz_parser import parse_questions
+
+    questions = []
+    for content in load_corpus():
+        for q_data in parse_questions(content):
+            normalized = main.normalize_question(copy.deepcopy(q_data))
+            if normalized is not None:
+                questions.append(main.build_quiz_question(normalized))
+    return questions
+
+
+def bench_markdown(main, quick: bool) -> list:
+    from quiz_markdown import render_quiz_markdown
+
+    questions = corpus_questions(main)
+    repeat = 200 if quick else 2000
+    results = []
+    for count in (6, 60):
+        quiz_data = main.build_quiz_data((questions * (count // len(questions) + 1))[:count])
+        markdown = render_quiz_markdown(quiz_data)
+        results.append({"name": f"{count}_questions", "chars": len(markdown), **time_call(lambda: render_quiz_markdown(quiz_data), repeat)})
+    return results
+
+
+def bench_leaderboard(main, quick: bool) -> list:
+    writes = 200 if quick else 2000
+    entries = [
+        main.LeaderboardEntry(
+            player_name=f"player{i % 150}",
+            score=i % 7,
+            total_questions=6,
+            time_taken=30 + i % 300,
+            quiz_topic=f"Topic {i % 5}",
+            completion_date=datetime.now().isoformat()
+        )
+        for i in range(writes)
+    ]
+
+    start = time.perf_counter()
+    for entry in entries:
+        main.save_leaderboard_entry(entry)
+    elapsed = time.perf_counter() - start
+
+    return [
+        {"name": "save_leaderboard_entry", "writes": writes, "mean_ms": round(elapsed / writes * 1000, 3), "writes_per_second": round(writes / elapsed, 1)},
+        {"name": "get_leaderboard_top_100", **time_call(lambda: main.get_leaderboard(100), 200)},
+        {"name": "get_leaderboard_topic", **time_call(lambda: main.get_leaderboard(100, "Topic 3"), 200)}
+    ]
+
+
+async def run_endpoints(main, quick: bool) -> list:
+    import httpx
+
+    repeat = 50 if quick else 300
+    questions = corpus_questions(main)
+    # No lifespan: the quiz store starts its writer on first use, and shutdown would close the leaderboard.
+    saved = [await main.save_quiz_to_file(main.build_quiz_data((questions * 10)[i % 7:i % 7 + 60])) for i in range(200)]
+    for i in range(5000):
+        main.save_leaderboard_entry(main.LeaderboardEntry(
+            player_name=f"player{i % 800}",
+            score=i % 7,
+            total_questions=6,
+            time_taken=30 + i % 300,
+            quiz_topic=f"Topic {i % 5}",
+            completion_date=datetime.now().isoformat()
+        ))
+
+    transport = httpx.ASGITransport(app=main.app)
+    # identity, so the numbers measure serialization rather than compression
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Accept-Encoding": "identity"}) as client:
+        results = []
+        for name, url in (
+            ("saved_quiz_60_questions", f"/api/quiz/{saved[0]}"),
+            ("saved_quizzes_200", "/api/saved-quizzes"),
+            ("leaderboard_top_100", "/api/leaderboard?limit=100"),
+            ("leaderboard_top_1000", "/api/leaderboard?limit=1000")
+        ):
+            response = await client.get(url)
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await client.get(url)
+                samples.append(time.perf_counter() - start)
+            results.append({
+                "name": name,
+                "bytes": len(response.content),
+                "repeat": repeat,
+                "mean_ms": round(statistics.mean(samples) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3)
+            })
+    return results
+
+
+async def run_e2e(main, concurrency_levels: list, requests_per_level: int) -> list:
+    import httpx
+
+    results = []
+    seed = 0
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for concurrency in concurrency_levels:
+                total = max(requests_per_level, concurrency)
+                # Distinct documents, so neither the AI cache nor single-flight hides the work.
+                documents = [make_document_text(3000, seed=seed + i) for i in range(total)]
+                seed += total
+                latencies = []
+                statuses = {}
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def one(document):
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await client.post("/api/generate-quiz", data={"text": document})
+                        latencies.append(time.perf_counter() - start)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+                start = time.perf_counter()
+                await asyncio.gather(*(one(document) for document in documents))
+                elapsed = time.perf_counter() - start
+
+                results.append({
+                    "name": f"concurrency_{concurrency}",
+                    "requests": total,
+                    "statuses": {str(code): n for code, n in sorted(statuses.items())},
+                    "throughput_rps": round(total / elapsed, 2),
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                    "max_ms": round(max(latencies) * 1000, 1)
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help=f"comma-separated sections to run ({', '.join(SECTIONS)})")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions and smaller documents")
+    parser.add_argument("--concurrency", default="1,4,16", help="e2e concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="e2e requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock OpenRouter reply delay in seconds")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    requested = args.only.split(",") if args.only else SECTIONS
+    unknown = set(requested) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+    sections = [section for section in SECTIONS if section in requested]
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    mock = MockOpenRouter(latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix="quiz-bench-")
+    os.environ.update({
+        "OPENROUTER_API_KEY": "bench",
+        "OPENROUTER_URL": mock.url,
+        "OPENROUTER_HTTP2": "false",
+        "OPENROUTER_REQUESTS_PER_MINUTE": "1000000",
+        "OPENROUTER_BURST": "100000",
+        "OPENROUTER_MAX_QUEUE": "100000"
+    })
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+
+    try:
+        import main as app_main
+
+        results = {}
+        runners = {
+            "extraction": lambda: bench_extraction(app_main, args.quick),
+            "parsing": lambda: bench_parsing(app_main, args.quick),
+            "markdown": lambda: bench_markdown(app_main, args.quick),
+            "leaderboard": lambda: bench_leaderboard(app_main, args.quick),
+            "endpoints": lambda: asyncio.run(run_endpoints(app_main, args.quick)),
+            "e2e": lambda: asyncio.run(run_e2e(app_main, [int(c) for c in args.concurrency.split(",")], args.requests))
+        }
+        for section in sections:
+            print(f"== {section}")
+            results[section] = runners[section]()
+            for row in results[section]:
+                print("  " + "  ".join(f"{key}={value}" for key, value in row.items()))
+    finally:
+        os.chdir(cwd)
+        mock.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "suite",
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "mock_latency_seconds": args.latency,
+        "upstream_requests": mock.requests,
+        "results": results
+    }
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Replies with the model outputs in benchmarks/corpus (clean, fenced, truncated
+and otherwise malformed), cycling through them in order, after a configurable
+delay. Streaming requests get the same content as SSE deltas.
+
+    python benchmarks/mock_openrouter.py [--port 8099] [--latency 0.05]
+
+then start the API with OPENROUTER_URL=http://127.0.0.1:8099/api/v1/chat/completions.
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+COMPLETIONS_PATH = "/api/v1/chat/completions"
+STREAM_DELTA_CHARS = 40
+
+
+def load_corpus() -> list:
+    samples = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, filename), 'r', encoding='utf-8') as f:
+            samples.append(f.read())
+    return samples
+
+
+class MockOpenRouter:
+    def __init__(self, samples: list = None, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.samples = samples or load_corpus()
+        self.latency = latency
+        self.requests = 0
+        self._cycle = itertools.cycle(self.samples)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{COMPLETIONS_PATH}"
+
+    def next_completion(self) -> str:
+        with self._lock:
+            self.requests += 1
+            return next(self._cycle)
+
+    def start(self) -> "MockOpenRouter":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if self.path != COMPLETIONS_PATH:
+                    self._send(404, b'{"error": {"message": "not found"}}', "application/json")
+                    return
+
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                content = mock.next_completion()
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                if payload.get("stream"):
+                    events = [
+                        "data: " + json.dumps({"choices": [{"delta": {"content": content[i:i + STREAM_DELTA_CHARS]}}]}) + "\n\n"
+                        for i in range(0, len(content), STREAM_DELTA_CHARS)
+                    ]
+                    events.append("data: [DONE]\n\n")
+                    self._send(200, "".join(events).encode("utf-8"), "text/event-stream")
+                    return
+
+                body = json.dumps({
+                    "model": payload.get("model"),
+                    "choices": [{"message": {"role": "assistant", "content": content}}]
+                })
+                self._send(200, body.encode("utf-8"), "application/json")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds to wait before each reply")
+    args = parser.parse_args()
+
+    mock = MockOpenRouter(latency=args.latency, port=args.port).start()
+    print(f"Mock OpenRouter listening on {mock.url}")
+    try:
+        mock._thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Deterministic synthetic documents for the offline benchmarks."""
+import io
+import random
+
+from docx import Document
+
+SUBJECTS = ["The operator", "Each facility", "The quality unit", "The sponsor", "The regulator", "Every site"]
+VERBS = ["must document", "shall review", "is required to audit", "must retain records of", "shall report"]
+OBJECTS = [
+    "all deviations within 30 days",
+    "calibration of critical equipment annually",
+    "training of personnel before assignment",
+    "supplier qualification every two years",
+    "corrective actions and their effectiveness",
+    "changes to validated processes"
+]
+
+
+def make_sentences(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} (clause {seed}.{i})."
+        for i in range(count)
+    ]
+
+
+def make_document_text(chars: int, seed: int = 0) -> str:
+    """Plain text of roughly ``chars`` characters, split into numbered sections."""
+    sentences = make_sentences(chars // 60 + 1, seed)
+    sections = []
+    for start in range(0, len(sentences), 8):
+        sections.append(f"Section {start // 8 + 1}\n" + " ".join(sentences[start:start + 8]))
+    return "\n\n".join(sections)[:chars]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """A minimal text-only PDF with Helvetica lines, built without extra dependencies."""
+    sentences = make_sentences(pages * lines_per_page, seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None]
+    font_id = 3 + 2 * pages
+    kids = []
+    for page in range(pages):
+        page_id = 3 + 2 * page
+        lines = sentences[page * lines_per_page:(page + 1) * lines_per_page]
+        stream = "BT /F1 9 Tf 40 760 Td 12 TL " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {page_id + 1} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref_offset = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_docx(paragraphs: int, seed: int = 0) -> bytes:
+    document = Document()
+    for i, sentence in enumerate(make_sentences(paragraphs, seed)):
+        if i % 10 == 0:
+            document.add_heading(f"Section {i // 10 + 1}", level=2)
+        document.add_paragraph(sentence)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
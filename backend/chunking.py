@@ -0,0 +1,96 @@
+import re
+from typing import Dict, List
+
+# Chunks end at page breaks, blank lines, or just before a line that looks
+# like a heading ("Section 4", "Article 12", "3.2 Scope", "DEFINITIONS").
+SECTION_BREAK_RE = re.compile(
+    r'\f|\n\s*\n|\n(?=[ \t]*(?:'
+    r'(?i:section|article|chapter|part|annex|appendix|schedule)\b'
+    r'|\d+(?:\.\d+)*[.)]?[ \t]+[A-Z]'
+    r'|[A-Z][A-Z0-9 ,&/()-]{3,}\n))'
+)
+FINGERPRINT_RE = re.compile(r'[^a-z0-9]+')
+
+def _split_oversized(segment: str, max_chars: int) -> List[str]:
+    pieces = []
+    while len(segment) > max_chars:
+        cut = max(segment.rfind('\n', 0, max_chars), segment.rfind('. ', 0, max_chars) + 1)
+        if cut <= max_chars // 2:
+            cut = segment.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(segment[:cut].strip())
+        segment = segment[cut:].strip()
+    if segment:
+        pieces.append(segment)
+    return pieces
+
+def split_into_chunks(text: str, max_chars: int, min_chars: int = 500) -> List[str]:
+    chunks = []
+    current = []
+    size = 0
+    for segment in SECTION_BREAK_RE.split(text):
+        segment = segment.strip()
+        if not segment:
+            continue
+        for piece in _split_oversized(segment, max_chars):
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current = []
+                size = 0
+            current.append(piece)
+            size += len(piece) + 2
+
+    if current:
+        tail = "\n\n".join(current)
+        if chunks and len(tail) < min_chars:
+            chunks[-1] = chunks[-1] + "\n\n" + tail
+        else:
+            chunks.append(tail)
+    return chunks
+
+def select_chunks(chunks: List[str], max_chunks: int) -> List[str]:
+    """Pick ``max_chunks`` chunks spread evenly from start to end of the document."""
+    if len(chunks) <= max_chunks:
+        return chunks
+    if max_chunks == 1:
+        return chunks[:1]
+    last = len(chunks) - 1
+    return [chunks[round(i * last / (max_chunks - 1))] for i in range(max_chunks)]
+
+def question_fingerprint(q_data: dict) -> str:
+    return FINGERPRINT_RE.sub(' ', str(q_data.get("question", "")).lower()).strip()
+
+def merge_chunk_questions(chunk_questions: List[List[dict]], count: int, type_quotas: Dict[str, int]) -> List[dict]:
+    """Round-robin over chunks so every part of the document is represented,
+    dropping duplicate questions and honouring the per-type quotas first.
+    """
+    seen = set()
+    remaining = dict(type_quotas)
+    selected = []
+    leftovers = []
+
+    depth = max((len(questions) for questions in chunk_questions), default=0)
+    for position in range(depth):
+        for questions in chunk_questions:
+            if position >= len(questions):
+                continue
+            q_data = questions[position]
+            fingerprint = question_fingerprint(q_data)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+
+            q_type = q_data.get("type")
+            if len(selected) < count and remaining.get(q_type, 0) > 0:
+                remaining[q_type] -= 1
+                selected.append(q_data)
+            else:
+                leftovers.append(q_data)
+
+    for q_data in leftovers:
+        if len(selected) >= count:
+            break
+        selected.append(q_data)
+
+    return selected
@@ -0,0 +1,180 @@
+import io
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, Iterator, Optional, Union
+import pdfplumber
+from docx import Document
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+PAGE_BREAK = "\f"
+
+# Extractors take the path of a spooled upload; raw bytes are still accepted.
+DocumentSource = Union[str, bytes]
+
+# The app is already running threads (the log listener, the quiz writer,
+# to_thread workers) when the pool starts, and forking a threaded process
+# copies their locks and queues half-way through. Workers come from a
+# forkserver instead, which preloads this module so they start with the
+# PDF/DOCX libraries imported.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _mp_context = multiprocessing.get_context("forkserver")
+    _mp_context.set_forkserver_preload([__name__])
+else:
+    _mp_context = multiprocessing.get_context("spawn")
+
+def _open_source(source: DocumentSource):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+def iter_pdf_pages(source: DocumentSource, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each non-empty page in ``[start, stop)``, one page at a time."""
+    with pdfplumber.open(_open_source(source)) as pdf:
+        for page in pdf.pages[start:stop]:
+            page_text = page.extract_text()
+            # Drop the parsed layout objects so memory stays flat on long documents.
+            page.flush_cache()
+            if page_text:
+                yield page_text + "\n" + PAGE_BREAK
+
+def count_pdf_pages(source: DocumentSource) -> int:
+    with pdfplumber.open(_open_source(source)) as pdf:
+        return len(pdf.pages)
+
+def read_pdf_pages(source: DocumentSource, start: int, stop: int) -> str:
+    return "".join(iter_pdf_pages(source, start, stop))
+
+def read_pdf_text(source: DocumentSource, max_chars: Optional[int] = None) -> str:
+    """Extract text page by page, stopping at the first page that brings the
+    total to ``max_chars`` so the rest of the document is never laid out.
+    """
+    parts = []
+    size = 0
+    for page_text in iter_pdf_pages(source):
+        parts.append(page_text)
+        size += len(page_text)
+        if max_chars and size >= max_chars:
+            break
+    return "".join(parts).strip()
+
+def read_docx_text(source: DocumentSource) -> str:
+    doc = Document(_open_source(source))
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
+
+def extract_text_from_pdf(source: DocumentSource) -> str:
+
+    try:
+        return read_pdf_text(source)
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {e}")
+        raise HTTPException(status_code=400, detail="Error processing PDF file")
+
+def extract_text_from_docx(source: DocumentSource) -> str:
+
+    try:
+        return read_docx_text(source)
+    except Exception as e:
+        logger.error(f"Error extracting text from DOCX: {e}")
+        raise HTTPException(status_code=400, detail="Error processing DOCX file")
+
+
+class ExtractionPool:
+    """Runs the CPU-bound extractors in worker processes, off the event loop.
+
+    At most ``max_pending`` documents are admitted (queued or running) at once;
+    further uploads wait up to ``queue_timeout`` seconds for a slot and are then
+    rejected with 503. Each document gets ``timeout`` seconds of processing time.
+    PDFs read in full are split into page ranges of at least
+    ``min_pages_per_task`` pages and extracted across the workers in parallel.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, queue_timeout: float, timeout: float, min_pages_per_task: int = 10):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.min_pages_per_task = min_pages_per_task
+        self.pending = 0
+        self._executor = None
+        self._slots = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context)
+
+    def start(self):
+        if self._executor is None:
+            self._executor = self._new_executor()
+            self._slots = asyncio.Semaphore(self.max_pending)
+            logger.info(f"Extraction pool started with {self.max_workers} workers")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+    def _submit(self, func: Callable, *args) -> Awaitable:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def extract_pdf(self, source: DocumentSource, max_chars: Optional[int] = None) -> str:
+        """Extract a PDF. With ``max_chars`` one worker reads pages lazily and
+        stops once it has enough text; without it the whole document is read
+        in parallel page ranges.
+        """
+        if max_chars:
+            return await self._run(lambda: self._submit(read_pdf_text, source, max_chars), "PDF")
+        return await self._run(lambda: self._read_pdf_ranges(source), "PDF")
+
+    async def extract_docx(self, source: DocumentSource) -> str:
+        return await self._run(lambda: self._submit(read_docx_text, source), "DOCX")
+
+    async def _read_pdf_ranges(self, source: DocumentSource) -> str:
+        page_count = await self._submit(count_pdf_pages, source)
+        pages_per_task = max(self.min_pages_per_task, -(-page_count // self.max_workers))
+        if page_count <= pages_per_task:
+            return await self._submit(read_pdf_text, source)
+
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+        logger.info(f"Extracting {page_count} PDF pages in {len(ranges)} parallel ranges")
+        parts = await asyncio.gather(*(self._submit(read_pdf_pages, source, start, stop) for start, stop in ranges))
+        return "".join(parts).strip()
+
+    # Workers run the plain readers and errors are mapped to HTTPException
+    # here, since HTTPException does not survive pickling between processes.
+    async def _run(self, work: Callable[[], Awaitable[str]], file_kind: str) -> str:
+        self.start()
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Extraction queue full ({self.max_pending} documents pending), rejecting upload")
+            raise HTTPException(status_code=503, detail="Server is busy processing other documents. Please try again shortly.")
+
+        self.pending += 1
+        try:
+            # A timed-out worker cannot be interrupted; it finishes in the
+            # background but no longer holds an admission slot.
+            return await asyncio.wait_for(work(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Text extraction timed out after {self.timeout}s")
+            raise HTTPException(status_code=504, detail="Document processing timed out. Try a smaller file.")
+        except BrokenProcessPool:
+            logger.error("Extraction worker crashed, restarting pool")
+            self._executor = self._new_executor()
+            raise HTTPException(status_code=500, detail="Error processing document")
+        except Exception as e:
+            logger.error(f"Error extracting text from {file_kind}: {e}")
+            raise HTTPException(status_code=400, detail=f"Error processing {file_kind} file")
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending
+        }
@@ -0,0 +1,122 @@
+import gzip
+from typing import Optional
+
+from negotiation import parse_accept
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The compression middleware tags ETags with the coding it applied, so a
+# compressed and an identity response never share a strong validator.
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+def _strip_encoding(etag: str) -> str:
+    for suffix in ENCODING_SUFFIXES:
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check, using weak comparison as RFC 9110 requires."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if _strip_encoding(candidate) == opaque:
+            return True
+    return False
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    for coding, quality in parse_accept(accept_encoding):
+        if quality <= 0:
+            continue
+        if coding in available:
+            return coding
+        if coding == "*":
+            return available[0]
+    return None
+
+
+class CompressionMiddleware:
+    """Compresses complete responses with brotli (when the ``brotli`` package
+    is installed) or gzip, per the request's Accept-Encoding.
+
+    Only single-message bodies of at least ``minimum_size`` bytes are
+    compressed. Streaming responses pass through untouched, so NDJSON and SSE
+    events still reach the client as they are produced.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compress(self, body: bytes, coding: str) -> bytes:
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        coding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            response_headers = list(start.get("headers", []))
+            names = {name.lower() for name, _ in response_headers}
+            body = message.get("body", b"")
+            if message.get("more_body") or b"content-encoding" in names or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self._compress(body, coding)
+            rewritten = []
+            vary = None
+            for name, value in response_headers:
+                lower = name.lower()
+                if lower == b"content-length":
+                    continue
+                if lower == b"etag" and value.endswith(b'"'):
+                    value = value[:-1] + f'-{coding}"'.encode("latin-1")
+                if lower == b"vary":
+                    vary = value
+                    continue
+                rewritten.append((name, value))
+            rewritten.append((b"content-encoding", coding.encode("latin-1")))
+            rewritten.append((b"content-length", str(len(compressed)).encode("latin-1")))
+            rewritten.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+            await send({**start, "headers": rewritten})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,235 @@
+import os
+import time
+import uuid
+import shutil
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException
+
+from serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Called with the job's content type and the path of its spooled input.
+JobHandler = Callable[[Optional[str], str], Awaitable[dict]]
+
+class JobQueue:
+    """Persistent queue of generation jobs served by a fixed pool of workers.
+
+    Job rows live in SQLite and uploaded inputs are spooled to disk, so jobs
+    that were queued or running when the server stopped are picked up again
+    on the next start.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        spool_dir: str,
+        handler: JobHandler,
+        workers: int = 2,
+        max_queued: int = 100,
+        retention_seconds: int = 24 * 3600,
+        prune_interval: float = 300
+    ):
+        self.spool_dir = spool_dir
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._tasks = []
+        self._events: Dict[str, asyncio.Event] = {}
+        os.makedirs(spool_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                content_type TEXT,
+                filename TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                error_status INTEGER
+            )"""
+        )
+
+    def _input_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.input")
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _set_status(self, job_id: str, status: str, result: dict = None, error: str = None, error_status: int = None):
+        self._execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, result = ?, error = ?, error_status = ? WHERE id = ?",
+            (status, time.time(), dumps(result).decode("utf-8") if result is not None else None, error, error_status, job_id)
+        )
+
+    def _prune(self):
+        self._last_prune = time.monotonic()
+        cutoff = time.time() - self.retention_seconds
+        expired = self._execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (JOB_COMPLETED, JOB_FAILED, cutoff)
+        )
+        for row in expired:
+            self._execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        if expired:
+            logger.info(f"Pruned {len(expired)} finished jobs")
+
+    def _maybe_prune(self):
+        # Finished jobs hold their full result, so expire them while running,
+        # not only on the next start.
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self._prune()
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._prune()
+        self._queue = asyncio.Queue()
+
+        pending = self._execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at ASC",
+            (JOB_QUEUED, JOB_RUNNING)
+        )
+        for row in pending:
+            self._set_status(row["id"], JOB_QUEUED)
+            self._events[row["id"]] = asyncio.Event()
+            self._queue.put_nowait(row["id"])
+        if pending:
+            logger.info(f"Resumed {len(pending)} unfinished jobs")
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        with self._lock:
+            self._conn.close()
+
+    async def _check_capacity(self):
+        if self._queue is None:
+            await self.start()
+        if self._queue.qsize() >= self.max_queued:
+            raise HTTPException(status_code=503, detail="Too many quiz generation jobs queued. Please try again shortly.")
+
+    async def submit(self, content_type: Optional[str], filename: Optional[str], data: bytes) -> dict:
+        await self._check_capacity()
+        job_id = uuid.uuid4().hex
+        with open(self._input_path(job_id), 'wb') as f:
+            f.write(data)
+        return self._enqueue(job_id, content_type, filename)
+
+    async def submit_file(self, content_type: Optional[str], filename: Optional[str], path: str) -> dict:
+        """Like submit, but takes ownership of an already spooled input file."""
+        await self._check_capacity()
+        job_id = uuid.uuid4().hex
+        shutil.move(path, self._input_path(job_id))
+        return self._enqueue(job_id, content_type, filename)
+
+    def _enqueue(self, job_id: str, content_type: Optional[str], filename: Optional[str]) -> dict:
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, content_type, filename, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, JOB_QUEUED, content_type, filename, now, now)
+        )
+        self._events[job_id] = asyncio.Event()
+        self._queue.put_nowait(job_id)
+        logger.info(f"Queued job {job_id} ({self._queue.qsize()} waiting)")
+        return self.get(job_id)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        rows = self._execute("SELECT content_type FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return
+
+        self._set_status(job_id, JOB_RUNNING)
+        input_path = self._input_path(job_id)
+        # Cancellation (stop() at shutdown) propagates with the job still
+        # running and its input in place, so start() resumes it.
+        try:
+            result = await self.handler(rows[0]["content_type"], input_path)
+            self._set_status(job_id, JOB_COMPLETED, result=result)
+            logger.info(f"Job {job_id} completed")
+        except HTTPException as e:
+            self._set_status(job_id, JOB_FAILED, error=str(e.detail), error_status=e.status_code)
+            logger.warning(f"Job {job_id} failed: {e.detail}")
+        except Exception as e:
+            self._set_status(job_id, JOB_FAILED, error=f"Error generating quiz: {str(e)}", error_status=500)
+            logger.error(f"Job {job_id} failed: {e}")
+
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+        self._maybe_prune()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+        if row["status"] == JOB_QUEUED and self._queue is not None:
+            job["queue_depth"] = self._queue.qsize()
+        if row["result"] is not None:
+            job["result"] = loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = {"status_code": row["error_status"], "detail": row["error"]}
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        event = self._events.get(job_id)
+        if event is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id)
+
+    def stats(self) -> dict:
+        counts = {row["status"]: row["total"] for row in self._execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status")}
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "jobs": counts
+        }
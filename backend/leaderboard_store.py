@@ -0,0 +1,172 @@
+import os
+import json
+import bisect
+import sqlite3
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_COLUMNS = (
+    "player_name",
+    "score",
+    "total_questions",
+    "percentage",
+    "time_taken",
+    "quiz_topic",
+    "completion_date"
+)
+
+class LeaderboardStore:
+    """Append-only SQLite table of scores. It is the durable record only:
+    rankings are served from a ``LeaderboardRanking`` loaded from
+    ``all_entries`` at startup.
+    """
+
+    def __init__(self, db_path: str, legacy_json_path: str = None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS leaderboard (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_name TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                total_questions INTEGER NOT NULL,
+                percentage REAL NOT NULL,
+                time_taken INTEGER NOT NULL,
+                quiz_topic TEXT NOT NULL,
+                completion_date TEXT NOT NULL
+            )"""
+        )
+        if legacy_json_path:
+            self._import_legacy_json(legacy_json_path)
+
+    def _import_legacy_json(self, legacy_json_path: str):
+        if not os.path.exists(legacy_json_path):
+            return
+        if self._conn.execute("SELECT 1 FROM leaderboard LIMIT 1").fetchone():
+            return
+
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                legacy_entries = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading legacy leaderboard {legacy_json_path}: {e}")
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for entry in legacy_entries:
+                    self._insert(entry)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Imported {len(legacy_entries)} leaderboard entries from {legacy_json_path}")
+
+    def _insert(self, entry: dict):
+        self._conn.execute(
+            f"INSERT INTO leaderboard ({', '.join(LEADERBOARD_COLUMNS)}) VALUES ({', '.join('?' * len(LEADERBOARD_COLUMNS))})",
+            tuple(entry[column] for column in LEADERBOARD_COLUMNS)
+        )
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._insert(entry)
+
+    def all_entries(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(LEADERBOARD_COLUMNS)} FROM leaderboard ORDER BY id ASC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaderboardRanking:
+    """Memory-resident ranking of every score, overall and per quiz topic.
+
+    Entries are kept sorted by (percentage desc, time_taken asc, arrival order),
+    so top-N is a slice and a
+    player's rank is a binary search for their best key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._overall = ([], [])
+        self._by_topic = {}
+        self._best_keys = {}
+
+    def load(self, entries: List[dict]):
+        for entry in entries:
+            self.add(entry)
+        logger.info(f"Leaderboard ranking loaded {len(entries)} entries across {len(self._by_topic)} topics")
+
+    @staticmethod
+    def _insert(ranking: Tuple[list, list], key: tuple, entry: dict):
+        keys, entries = ranking
+        position = bisect.bisect(keys, key)
+        keys.insert(position, key)
+        entries.insert(position, entry)
+
+    def _update_best(self, scope: Optional[str], player_name: str, key: tuple):
+        best_key = self._best_keys.get((scope, player_name))
+        if best_key is None or key < best_key:
+            self._best_keys[(scope, player_name)] = key
+
+    def add(self, entry: dict):
+        with self._lock:
+            key = (-entry["percentage"], entry["time_taken"], self._sequence)
+            self._sequence += 1
+
+            topic = entry["quiz_topic"]
+            self._insert(self._overall, key, entry)
+            self._insert(self._by_topic.setdefault(topic, ([], [])), key, entry)
+
+            self._update_best(None, entry["player_name"], key)
+            self._update_best(topic, entry["player_name"], key)
+
+    def _ranking(self, topic: Optional[str]) -> Tuple[list, list]:
+        if topic is None:
+            return self._overall
+        return self._by_topic.get(topic, ([], []))
+
+    def top(self, limit: int = 100, topic: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            return self._ranking(topic)[1][:limit]
+
+    def rank(self, player_name: str, topic: Optional[str] = None) -> Optional[dict]:
+        with self._lock:
+            best_key = self._best_keys.get((topic, player_name))
+            if best_key is None:
+                return None
+
+            keys, entries = self._ranking(topic)
+            position = bisect.bisect_left(keys, best_key)
+            return {
+                "player_name": player_name,
+                "quiz_topic": topic,
+                "rank": position + 1,
+                "total_entries": len(keys),
+                "best_entry": entries[position]
+            }
+
+    @property
+    def version(self) -> int:
+        """Number of entries added; scores are append-only, so this identifies the ranking."""
+        with self._lock:
+            return self._sequence
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return sorted(self._by_topic)
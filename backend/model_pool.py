@@ -0,0 +1,149 @@
+import time
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ModelHealth:
+    def __init__(self, model: str, window: int):
+        self.model = model
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probe_until = 0.0
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def is_open(self, now: float) -> bool:
+        return self.open_until > now
+
+    def state(self, now: float) -> str:
+        if not self.open_until:
+            return "closed"
+        return "open" if self.is_open(now) else "half_open"
+
+
+class ModelPool:
+    """Ordered list of OpenRouter models with per-model latency and error tracking.
+
+    A model that fails ``failure_threshold`` times in a row has its circuit
+    opened and is skipped for ``cooldown_seconds``. After that the circuit is
+    half-open: the first caller of ``candidates(probe=True)`` gets the model
+    as a probe and everyone else keeps skipping it until the probe succeeds
+    (closing the circuit), fails (reopening it) or is not heard back from
+    within ``cooldown_seconds`` (letting another probe through). The hedge delay for a
+    model is its observed latency percentile, so a second model is only asked
+    once the first is slower than it usually is.
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 60,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        default_hedge_delay: float = 20,
+        window: int = 200
+    ):
+        if not models:
+            raise ValueError("ModelPool needs at least one model")
+        self.models = list(dict.fromkeys(models))
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self._health: Dict[str, ModelHealth] = {model: ModelHealth(model, window) for model in self.models}
+
+    @property
+    def primary(self) -> str:
+        return self.candidates()[0]
+
+    def candidates(self, probe: bool = False) -> List[str]:
+        """Models in configured order with open circuits left out. Callers
+        that will send requests pass ``probe=True``, which hands out a
+        half-open model's single probe; otherwise half-open models are left
+        out too. If nothing is available, all models are returned, soonest to
+        recover first.
+        """
+        now = time.time()
+        available = []
+        for model in self.models:
+            health = self._health[model]
+            state = health.state(now)
+            if state == "closed":
+                available.append(model)
+            elif state == "half_open" and probe and health.probe_until <= now:
+                health.probe_until = now + self.cooldown_seconds
+                logger.info(f"Letting one probe request through to model {model}")
+                available.append(model)
+        if available:
+            return available
+        return sorted(self.models, key=lambda model: self._health[model].open_until)
+
+    def hedge_delay(self, model: str) -> float:
+        health = self._health[model]
+        if len(health.latencies) < self.hedge_min_samples:
+            return self.default_hedge_delay
+        return health.percentile(self.hedge_percentile)
+
+    def record_latency(self, model: str, seconds: float):
+        health = self._health[model]
+        health.latencies.append(seconds)
+        # A cancelled request says nothing about recovery; free the probe.
+        health.probe_until = 0.0
+
+    def record_success(self, model: str, seconds: Optional[float] = None):
+        health = self._health[model]
+        if seconds is not None:
+            health.latencies.append(seconds)
+        health.successes += 1
+        health.consecutive_failures = 0
+        health.probe_until = 0.0
+        if health.open_until:
+            logger.info(f"Model {model} recovered, closing circuit")
+            health.open_until = 0.0
+
+    def record_failure(self, model: str):
+        health = self._health[model]
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.probe_until = 0.0
+        if health.consecutive_failures >= self.failure_threshold:
+            health.open_until = time.time() + self.cooldown_seconds
+            logger.warning(f"Opening circuit for model {model} after {health.consecutive_failures} consecutive failures")
+
+    def stats(self) -> dict:
+        now = time.time()
+        models = []
+        for model in self.models:
+            health = self._health[model]
+            p50 = health.percentile(50)
+            p95 = health.percentile(95)
+            models.append({
+                "model": model,
+                "circuit": health.state(now),
+                "successes": health.successes,
+                "failures": health.failures,
+                "consecutive_failures": health.consecutive_failures,
+                "p50_seconds": round(p50, 3) if p50 is not None else None,
+                "p95_seconds": round(p95, 3) if p95 is not None else None,
+                "hedge_delay_seconds": round(self.hedge_delay(model), 3)
+            })
+        return {
+            "models": models,
+            "hedged_requests": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks
+        }
@@ -0,0 +1,46 @@
+from typing import Dict, List, Optional, Tuple
+
+def parse_accept(header: Optional[str]) -> List[Tuple[str, float]]:
+    """Media ranges from an Accept header, highest quality first.
+
+    Ties keep header order, and malformed q-values count as 1.
+    """
+    ranges = []
+    for part in (header or "").split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        ranges.append((media_type.lower(), quality))
+    return sorted(ranges, key=lambda r: -r[1])
+
+def negotiate(header: Optional[str], offered: Dict[str, str], default: str) -> Optional[str]:
+    """Pick a format for an Accept header.
+
+    ``offered`` maps media types to format names. ``default`` is used for a
+    missing header and for wildcards. Returns None when nothing offered is
+    acceptable.
+    """
+    ranges = parse_accept(header)
+    if not ranges:
+        return default
+    for media_type, quality in ranges:
+        if quality <= 0:
+            continue
+        if media_type in offered:
+            return offered[media_type]
+        if media_type == "*/*":
+            return default
+        if media_type.endswith("/*"):
+            prefix = media_type[:-1]
+            for offered_type, name in offered.items():
+                if offered_type.startswith(prefix):
+                    return name
+    return None
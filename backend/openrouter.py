@@ -0,0 +1,267 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Optional
+import httpx
+from fastapi import HTTPException
+from metrics import UPSTREAM_RESPONSES
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+OPENROUTER_MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10"))
+OPENROUTER_KEEPALIVE_EXPIRY = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30"))
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+OPENROUTER_WRITE_TIMEOUT = float(os.getenv("OPENROUTER_WRITE_TIMEOUT", "10"))
+OPENROUTER_POOL_TIMEOUT = float(os.getenv("OPENROUTER_POOL_TIMEOUT", "10"))
+OPENROUTER_HTTP2 = os.getenv("OPENROUTER_HTTP2", "true").lower() in ("1", "true", "yes")
+
+OPENROUTER_REQUESTS_PER_MINUTE = float(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "20"))
+OPENROUTER_BURST = int(os.getenv("OPENROUTER_BURST", "5"))
+OPENROUTER_MAX_QUEUE = int(os.getenv("OPENROUTER_MAX_QUEUE", "50"))
+OPENROUTER_MAX_QUEUE_WAIT = float(os.getenv("OPENROUTER_MAX_QUEUE_WAIT", "30"))
+OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "2"))
+OPENROUTER_RETRY_BASE_DELAY = float(os.getenv("OPENROUTER_RETRY_BASE_DELAY", "0.5"))
+OPENROUTER_RETRY_MAX_DELAY = float(os.getenv("OPENROUTER_RETRY_MAX_DELAY", "10"))
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def create_http_client() -> httpx.AsyncClient:
+    http2 = OPENROUTER_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("OPENROUTER_HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENROUTER_MAX_KEEPALIVE,
+            keepalive_expiry=OPENROUTER_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            connect=OPENROUTER_CONNECT_TIMEOUT,
+            read=OPENROUTER_READ_TIMEOUT,
+            write=OPENROUTER_WRITE_TIMEOUT,
+            pool=OPENROUTER_POOL_TIMEOUT
+        )
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def rate_limit_detail(reset_at: Optional[float]) -> str:
+    if reset_at:
+        reset_str = datetime.fromtimestamp(reset_at).strftime("%B %d, %Y at %I:%M %p")
+        return f"Daily rate limit exceeded for free tier. Resets on {reset_str}. Consider upgrading to paid tier for more requests."
+    return "Rate limit exceeded. Please wait before generating another quiz."
+
+def parse_rate_limit_reset(value) -> Optional[float]:
+    # OpenRouter reports X-RateLimit-Reset as epoch milliseconds.
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    return reset / 1000 if reset > 1e11 else reset
+
+def rate_limit_headers(response: httpx.Response) -> dict:
+    """Rate limit headers from the response, or from the error body where
+    OpenRouter forwards the provider's headers on a 429.
+    """
+    headers = {k: v for k, v in response.headers.items() if k.lower().startswith("x-ratelimit-")}
+    if response.status_code == 429:
+        try:
+            body_headers = response.json().get("error", {}).get("metadata", {}).get("headers", {}) or {}
+            headers.update({k.lower(): v for k, v in body_headers.items()})
+        except Exception:
+            pass
+    return {k.lower(): v for k, v in headers.items()}
+
+
+class RateLimiter:
+    """Client-side token bucket in front of OpenRouter.
+
+    Requests wait in FIFO order for a token, so bursts are smoothed to the
+    configured rate instead of being rejected upstream. The bucket learns from
+    the X-RateLimit-* headers: when the upstream budget runs out it holds all
+    requests until the advertised reset, and fails fast when that reset is
+    further away than callers are willing to wait.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int, max_queue: int, max_queue_wait: float):
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.tokens = float(burst)
+        self.queue_depth = 0
+        self.blocked_until = 0.0
+        self.upstream_limit = None
+        self.upstream_remaining = None
+        self.upstream_reset = None
+        self.throttled = 0
+        self.retries = 0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _blocked_for(self) -> float:
+        return max(0.0, self.blocked_until - time.time())
+
+    async def acquire(self):
+        if self.queue_depth >= self.max_queue:
+            raise HTTPException(status_code=503, detail="Too many quiz generations waiting for the AI service. Please try again shortly.")
+
+        self.queue_depth += 1
+        try:
+            async with self._lock:
+                blocked_for = self._blocked_for()
+                if blocked_for > self.max_queue_wait:
+                    raise HTTPException(status_code=429, detail=rate_limit_detail(self.upstream_reset))
+
+                self._refill()
+                wait = max(blocked_for, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0)
+                if wait > self.max_queue_wait:
+                    raise HTTPException(status_code=503, detail="Too many quiz generations waiting for the AI service. Please try again shortly.")
+                if wait > 0:
+                    self.throttled += 1
+                    logger.info(f"Rate limiter delaying OpenRouter request by {wait:.2f}s")
+                    await asyncio.sleep(wait)
+                    self._refill()
+
+                self.tokens -= 1
+        finally:
+            self.queue_depth -= 1
+
+    def _expire_upstream(self):
+        # OpenRouter only sends the remaining count on some responses, so a
+        # reported count is dropped once its window has reset.
+        if self.upstream_reset is not None and self.upstream_reset <= time.time():
+            self.upstream_remaining = None
+            self.upstream_reset = None
+
+    def observe(self, response: httpx.Response):
+        headers = rate_limit_headers(response)
+        if "x-ratelimit-limit" in headers:
+            try:
+                self.upstream_limit = int(headers["x-ratelimit-limit"])
+            except ValueError:
+                pass
+        remaining = None
+        if "x-ratelimit-remaining" in headers:
+            try:
+                remaining = int(headers["x-ratelimit-remaining"])
+                self.tokens = min(self.tokens, float(remaining))
+            except ValueError:
+                pass
+        reset = parse_rate_limit_reset(headers.get("x-ratelimit-reset"))
+        if reset:
+            self.upstream_reset = reset
+        if remaining is not None:
+            self.upstream_remaining = remaining
+        else:
+            self._expire_upstream()
+
+        if response.status_code == 429 or remaining == 0:
+            self.tokens = 0.0
+            if self.upstream_reset and self.upstream_reset > time.time():
+                self.blocked_until = self.upstream_reset
+            else:
+                self.blocked_until = time.time() + OPENROUTER_RETRY_BASE_DELAY * 4
+            logger.warning(f"OpenRouter rate limit reached, holding requests for {self._blocked_for():.1f}s")
+
+    def retry_delay(self, response: Optional[httpx.Response], attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None when retrying is pointless."""
+        if response is not None and response.status_code == 429:
+            blocked_for = self._blocked_for()
+            if blocked_for > OPENROUTER_RETRY_MAX_DELAY:
+                return None
+            return blocked_for + random.uniform(0, OPENROUTER_RETRY_BASE_DELAY)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(OPENROUTER_RETRY_MAX_DELAY, OPENROUTER_RETRY_BASE_DELAY * (2 ** attempt)))
+
+    def stats(self) -> dict:
+        self._refill()
+        self._expire_upstream()
+        return {
+            "requests_per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "available_tokens": round(self.tokens, 2),
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "blocked_for_seconds": round(self._blocked_for(), 1),
+            "upstream_limit": self.upstream_limit,
+            "upstream_remaining": self.upstream_remaining,
+            "upstream_reset": datetime.fromtimestamp(self.upstream_reset).isoformat() if self.upstream_reset else None,
+            "throttled_requests": self.throttled,
+            "retries": self.retries
+        }
+
+
+rate_limiter = RateLimiter(
+    requests_per_minute=OPENROUTER_REQUESTS_PER_MINUTE,
+    burst=OPENROUTER_BURST,
+    max_queue=OPENROUTER_MAX_QUEUE,
+    max_queue_wait=OPENROUTER_MAX_QUEUE_WAIT
+)
+
+async def send_openrouter_request(build_request: Callable[[], httpx.Request], stream: bool = False) -> httpx.Response:
+    """Send through the rate limiter, retrying 429/5xx and transport errors
+    with jittered backoff. Non-200 responses are returned fully read.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        await rate_limiter.acquire()
+        try:
+            response = await client.send(build_request(), stream=stream)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            UPSTREAM_RESPONSES.inc(status="timeout" if isinstance(e, httpx.TimeoutException) else "error")
+            if attempt >= OPENROUTER_MAX_RETRIES:
+                raise
+            delay = rate_limiter.retry_delay(None, attempt)
+            logger.warning(f"OpenRouter request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+        else:
+            UPSTREAM_RESPONSES.inc(status=str(response.status_code))
+            if response.status_code != 200 and stream:
+                await response.aread()
+                await response.aclose()
+            rate_limiter.observe(response)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= OPENROUTER_MAX_RETRIES:
+                return response
+            delay = rate_limiter.retry_delay(response, attempt)
+            if delay is None:
+                return response
+            logger.warning(f"OpenRouter returned {response.status_code}, retrying in {delay:.2f}s")
+
+        attempt += 1
+        rate_limiter.retries += 1
+        await asyncio.sleep(delay)
@@ -0,0 +1,150 @@
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from serialization import dump_file, load_file
+
+logger = logging.getLogger(__name__)
+
+def summarize_quiz(filename: str, quiz_data: dict) -> dict:
+    return {
+        "filename": filename,
+        "generated_at": quiz_data.get("generated_at"),
+        "total_questions": quiz_data.get("total_questions", 0),
+        "topics": sorted(set(q.get("topic", "Unknown") for q in quiz_data.get("questions", [])))
+    }
+
+def _parse_bound(value: Optional[str], end_of_day: bool = False) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1) - timedelta(microseconds=1)
+    return parsed
+
+class QuizIndex:
+    """Metadata for every saved quiz, kept in memory and persisted next to the
+    quiz files so listing never has to open them.
+    """
+
+    def __init__(self, storage_dir: str, index_filename: str, excluded_files: Tuple[str, ...] = ()):
+        self.storage_dir = storage_dir
+        self.index_path = os.path.join(storage_dir, index_filename)
+        self.excluded_files = set(excluded_files) | {index_filename}
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._ordered = None
+        self._version = None
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            try:
+                self._entries = {entry["filename"]: entry for entry in load_file(self.index_path)}
+            except Exception as e:
+                logger.error(f"Error loading quiz index, rebuilding: {e}")
+                self._entries = {}
+        self.sync()
+
+    def sync(self):
+        """Index quiz files that are missing from the index and forget deleted ones."""
+        on_disk = set(
+            filename for filename in os.listdir(self.storage_dir)
+            if filename.endswith('.json') and filename not in self.excluded_files
+        )
+
+        with self._lock:
+            changed = False
+            for filename in set(self._entries) - on_disk:
+                del self._entries[filename]
+                changed = True
+
+            for filename in on_disk - set(self._entries):
+                try:
+                    quiz_data = load_file(os.path.join(self.storage_dir, filename))
+                except Exception as e:
+                    logger.error(f"Error reading quiz file {filename}: {e}")
+                    continue
+                if isinstance(quiz_data, dict) and "questions" in quiz_data:
+                    self._entries[filename] = summarize_quiz(filename, quiz_data)
+                    changed = True
+
+            if changed:
+                self._ordered = None
+                self._version = None
+                self._persist()
+
+        logger.info(f"Quiz index holds {len(self._entries)} quizzes")
+
+    def _persist(self):
+        tmp_path = f"{self.index_path}.tmp"
+        dump_file(tmp_path, list(self._entries.values()))
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, filename: str, quiz_data: dict):
+        self.update_many([(filename, quiz_data)])
+
+    def update_many(self, quizzes: List[Tuple[str, dict]]):
+        with self._lock:
+            for filename, quiz_data in quizzes:
+                self._entries[filename] = summarize_quiz(filename, quiz_data)
+            self._ordered = None
+            self._version = None
+            try:
+                self._persist()
+            except Exception as e:
+                logger.error(f"Error writing quiz index: {e}")
+
+    @property
+    def version(self) -> str:
+        """Changes whenever the indexed quizzes do. Quiz files are written once,
+        so the set of filenames identifies the index contents, and every
+        process serving the same directory agrees on it.
+        """
+        with self._lock:
+            if self._version is None:
+                digest = hashlib.sha256("\n".join(sorted(self._entries)).encode("utf-8"))
+                self._version = digest.hexdigest()[:16]
+            return self._version
+
+    def get(self, filename: str) -> Optional[dict]:
+        return self._entries.get(filename)
+
+    def query(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[List[dict], int]:
+        since_dt = _parse_bound(since)
+        until_dt = _parse_bound(until, end_of_day=True)
+        topic_key = topic.lower() if topic else None
+
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = sorted(self._entries.values(), key=lambda x: x.get("generated_at") or "", reverse=True)
+            ordered = self._ordered
+
+        matches = []
+        for entry in ordered:
+            if topic_key and topic_key not in (t.lower() for t in entry["topics"]):
+                continue
+            if since_dt or until_dt:
+                if not entry.get("generated_at"):
+                    continue
+                generated_at = datetime.fromisoformat(entry["generated_at"])
+                if since_dt and generated_at < since_dt:
+                    continue
+                if until_dt and generated_at > until_dt:
+                    continue
+            matches.append(entry)
+
+        end = offset + limit if limit is not None else None
+        return matches[offset:end], len(matches)
@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional
+
+# Part of every ETag, so cached copies are invalidated when the output format changes.
+RENDERER_VERSION = "1"
+
+def _question_lines(number: int, q: dict) -> List[str]:
+    question_type = q.get("type", "multiple-choice")
+    answer = q["answer"]
+    lines = [
+        f"### Question {number}",
+        f"**Level:** {q.get('level', 'Beginner')} | **Type:** {question_type.replace('-', ' ').title()}",
+        "",
+        f"**Q:** {q['question']}",
+        ""
+    ]
+
+    if question_type == "multiple-choice":
+        for i, option in enumerate(q["options"]):
+            marker = "[CORRECT]" if option == answer else "[OPTION]"
+            lines.append(f"{marker} **{chr(65 + i)}.** {option}")
+    elif question_type == "true-false":
+        for option in q["options"]:
+            marker = "[CORRECT]" if option == answer else "[OPTION]"
+            lines.append(f"{marker} **{option}**")
+    elif question_type == "matching":
+        lines.append("**Match the items:**")
+        for i, option in enumerate(q["options"]):
+            if "|" in option:
+                item, desc = option.split("|", 1)
+                lines.append(f"{i+1}. {item} -> {desc}")
+            else:
+                lines.append(f"{i+1}. {option}")
+        lines.append(f"**Correct Matches:** {answer}")
+
+    lines.extend(["", f"**Correct Answer:** {answer}", "", "---", ""])
+    return lines
+
+def iter_quiz_markdown(quiz_data: dict) -> Iterator[str]:
+    """Render a saved quiz as Markdown, one chunk per question.
+
+    The output depends only on ``quiz_data``: the timestamp is the quiz's
+    ``generated_at``, so the same file always renders to the same bytes.
+    Questions are grouped by topic in order of first appearance and keep
+    their original numbers.
+    """
+    questions = quiz_data.get("questions", [])
+    by_topic = {}
+    answer_key = ["## Answer Key", ""]
+    for number, q in enumerate(questions, start=1):
+        topic = q.get("topic", "General Knowledge")
+        by_topic.setdefault(topic, []).append((number, q))
+        answer_key.append(f"{number}. {q['answer']} ({q.get('level', 'Beginner')} - {topic})")
+
+    if len(by_topic) == 1:
+        title = f"# {next(iter(by_topic))} Quiz"
+    elif by_topic:
+        title = f"# Multi-Topic Quiz ({', '.join(by_topic)})"
+    else:
+        title = "# Quiz"
+
+    header = [title, ""]
+    generated_at = quiz_data.get("generated_at")
+    if generated_at:
+        header.append(f"**Generated:** {datetime.fromisoformat(generated_at).strftime('%B %d, %Y at %I:%M %p')}")
+    header.extend([f"**Total Questions:** {len(questions)}", ""])
+    yield "\n".join(header) + "\n"
+
+    for topic, topic_questions in by_topic.items():
+        yield f"## {topic}\n\n"
+        for number, q in topic_questions:
+            yield "\n".join(_question_lines(number, q)) + "\n"
+
+    yield "\n".join(answer_key)
+
+def render_quiz_markdown(quiz_data: dict) -> str:
+    return "".join(iter_quiz_markdown(quiz_data))
+
+
+class RenderedMarkdown(NamedTuple):
+    mtime_ns: int
+    size: int
+    text: str
+
+
+class MarkdownCache:
+    """Rendered Markdown per quiz file, least recently used first out.
+
+    An entry is only returned while the file's mtime and size still match the
+    ones it was rendered from.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, RenderedMarkdown]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename: str, mtime_ns: int, size: int) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is None or entry.mtime_ns != mtime_ns or entry.size != size:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(filename)
+            self.hits += 1
+            return entry.text
+
+    def set(self, filename: str, mtime_ns: int, size: int, text: str):
+        with self._lock:
+            self._entries[filename] = RenderedMarkdown(mtime_ns, size, text)
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def markdown_etag(mtime_ns: int, size: int) -> str:
+    return f'"md{RENDERER_VERSION}-{mtime_ns:x}-{size:x}"'
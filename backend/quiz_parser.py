@@ -0,0 +1,177 @@
+import re
+import json
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+STRUCTURAL_RE = re.compile(r'[{}"]')
+STRING_SPECIAL_RE = re.compile(r'["\\]')
+JSON_DECODER = json.JSONDecoder()
+
+def parse_json_object(text: str) -> Optional[dict]:
+    try:
+        obj = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            obj = json.loads(TRAILING_COMMA_RE.sub(r'\1', text))
+        except json.JSONDecodeError:
+            logger.warning(f"Could not parse JSON object: {text}")
+            return None
+    return obj if isinstance(obj, dict) else None
+
+def unwrap_questions(obj: dict) -> List[dict]:
+    if isinstance(obj.get("questions"), list):
+        return [q_data for q_data in obj["questions"] if isinstance(q_data, dict)]
+    return [obj]
+
+
+class IncrementalJSONObjectParser:
+    """Emits each outermost JSON object as soon as its closing brace arrives.
+
+    Text outside objects (array brackets, commas, code fences, prose) is
+    skipped, and braces inside string literals are ignored, so chunks can be
+    fed straight from a streamed completion. The scanner only stops on
+    structural characters, so each input character is visited once.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._parts = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        objects = []
+        pos = 0
+        start = 0
+        length = len(chunk)
+
+        if self._escape and length:
+            self._escape = False
+            pos = 1
+
+        while pos < length:
+            if self._depth == 0:
+                pos = chunk.find('{', pos)
+                if pos == -1:
+                    return objects
+                self._depth = 1
+                start = pos
+                pos += 1
+                continue
+
+            if self._in_string:
+                match = STRING_SPECIAL_RE.search(chunk, pos)
+                if match is None:
+                    break
+                if match.group() == '"':
+                    self._in_string = False
+                    pos = match.end()
+                elif match.end() < length:
+                    pos = match.end() + 1
+                else:
+                    self._escape = True
+                    pos = length
+                continue
+
+            match = STRUCTURAL_RE.search(chunk, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start:pos])
+                    obj = parse_json_object(''.join(self._parts))
+                    self._parts = []
+                    if obj is not None:
+                        objects.append(obj)
+
+        if self._depth > 0:
+            self._parts.append(chunk[start:])
+        return objects
+
+    def feed_questions(self, chunk: str) -> List[dict]:
+        questions = []
+        for obj in self.feed(chunk):
+            questions.extend(unwrap_questions(obj))
+        return questions
+
+
+def find_object_end(text: str, start: int) -> int:
+    """Index just past the brace closing the object opened at ``start``, or -1."""
+    depth = 0
+    pos = start
+    in_string = False
+    while True:
+        if in_string:
+            match = STRING_SPECIAL_RE.search(text, pos)
+            if match is None:
+                return -1
+            in_string = match.group() != '"'
+            pos = match.end() + (1 if in_string else 0)
+            continue
+
+        match = STRUCTURAL_RE.search(text, pos)
+        if match is None:
+            return -1
+        pos = match.end()
+        char = match.group()
+        if char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+def parse_questions(content: str, on_fallback: Optional[Callable[[str], None]] = None) -> List[dict]:
+    """Parse every question object out of a complete model response.
+
+    Handles code fences, surrounding prose, a bare array, concatenated objects,
+    a {"questions": [...]} wrapper and trailing commas; an object cut off by
+    max_tokens is dropped. Well-formed objects are decoded in place by the C
+    decoder; only objects it still rejects after a single trailing-comma
+    cleanup are re-scanned for repair. ``on_fallback`` is called with
+    "trailing_comma", "scan" or "truncated" each time one of those paths is taken.
+    """
+    questions = []
+    pos = 0
+    repaired = False
+    while True:
+        pos = content.find('{', pos)
+        if pos == -1:
+            return questions
+
+        try:
+            obj, pos = JSON_DECODER.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            if not repaired:
+                # Models tend to repeat the same mistake, so strip trailing
+                # commas from the rest of the response once and retry.
+                repaired = True
+                if on_fallback:
+                    on_fallback("trailing_comma")
+                content = content[:pos] + TRAILING_COMMA_RE.sub(r'\1', content[pos:])
+                continue
+            end = find_object_end(content, pos)
+            if end == -1:
+                logger.warning(f"Dropping incomplete JSON object: {content[pos:]}")
+                if on_fallback:
+                    on_fallback("truncated")
+                return questions
+            if on_fallback:
+                on_fallback("scan")
+            obj = parse_json_object(content[pos:end])
+            pos = end
+
+        if isinstance(obj, dict):
+            questions.extend(unwrap_questions(obj))
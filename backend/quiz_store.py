@@ -0,0 +1,165 @@
+import os
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from metrics import STAGE_SECONDS
+from quiz_index import QuizIndex
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+def new_quiz_filename(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    return f"quiz_{now:%m_%d_%H%M%S}_{uuid.uuid4().hex[:8]}.json"
+
+
+class QuizStore:
+    """Persists generated quizzes without blocking the event loop.
+
+    ``save`` hands the quiz to a single writer thread and returns a future that
+    callers await for the name the quiz was saved under, so the name they hand
+    out is already readable. The writer drains every queued quiz in one
+    batch: each is written to a temp file, fsynced, then hard-linked under a
+    name from ``new_quiz_filename`` (an existing file is never overwritten; a
+    name that is taken just draws another), and the directory fsync and the
+    index update happen once per batch. A failed write resolves the future to
+    ``None``.
+    """
+
+    def __init__(self, storage_dir: str, index: QuizIndex, fsync: bool = True, max_batch: int = 64):
+        self.storage_dir = storage_dir
+        self.index = index
+        self.fsync = fsync
+        self.max_batch = max_batch
+        self.saved = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer, name="quiz-store", daemon=True)
+                self._thread.start()
+
+    def close(self):
+        """Write everything still queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def save(self, quiz_data: dict) -> "asyncio.Future[Optional[str]]":
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.start()
+        self._queue.put((quiz_data, loop, future))
+        return future
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stopping:
+                return
+
+    def _write_temp(self, quiz_data: dict) -> str:
+        fd, tmp_path = tempfile.mkstemp(prefix=".quiz-", suffix=".tmp", dir=self.storage_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(dumps(quiz_data))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def _publish(self, tmp_path: str) -> str:
+        try:
+            while True:
+                filename = new_quiz_filename()
+                try:
+                    os.link(tmp_path, os.path.join(self.storage_dir, filename))
+                    return filename
+                except FileExistsError:
+                    logger.warning(f"Quiz file {filename} already exists, drawing a new name")
+        finally:
+            os.remove(tmp_path)
+
+    def _sync_directory(self):
+        fd = os.open(self.storage_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_batch(self, batch: List[Tuple[dict, asyncio.AbstractEventLoop, asyncio.Future]]):
+        results = []
+        for quiz_data, _, _ in batch:
+            start = time.perf_counter()
+            try:
+                filename = self._publish(self._write_temp(quiz_data))
+                # The "save" stage is the write itself, observed here on the writer thread.
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage="save")
+                logger.info(f"Quiz saved to: {os.path.join(self.storage_dir, filename)}")
+                results.append(filename)
+            except Exception as e:
+                logger.error(f"Error saving quiz to file: {e}")
+                results.append(None)
+
+        saved = [(filename, quiz_data) for filename, (quiz_data, _, _) in zip(results, batch) if filename]
+        if saved:
+            if self.fsync:
+                try:
+                    self._sync_directory()
+                except OSError as e:
+                    logger.warning(f"Could not fsync {self.storage_dir}: {e}")
+            self.index.update_many(saved)
+
+        self.batches += 1
+        self.saved += len(saved)
+        self.failed += len(batch) - len(saved)
+        for filename, (_, loop, future) in zip(results, batch):
+            try:
+                loop.call_soon_threadsafe(_resolve, future, filename)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "failed": self.failed,
+            "batches": self.batches,
+            "queued": self._queue.qsize(),
+            "fsync": self.fsync
+        }
+
+
+def _resolve(future: asyncio.Future, filename: Optional[str]):
+    if not future.done():
+        future.set_result(filename)
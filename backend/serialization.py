@@ -0,0 +1,47 @@
+import os
+import json
+import logging
+from typing import Any, Union
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# orjson when it is installed, the stdlib json module otherwise (or with
+# JSON_BACKEND=json). Both write compact UTF-8.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson is not None else "json").lower()
+if JSON_BACKEND == "orjson" and orjson is None:
+    logger.warning("JSON_BACKEND is orjson but the 'orjson' package is not installed, falling back to json")
+    JSON_BACKEND = "json"
+
+if JSON_BACKEND == "orjson":
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+def dump_file(path: str, obj: Any):
+    with open(path, 'wb') as f:
+        f.write(dumps(obj))
+
+def load_file(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,155 @@
+import hmac
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import traceback
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+DIAGNOSTIC = "diagnostic"
+DEBUG_HEADER = b"x-debug-log"
+REQUEST_ID_HEADER = b"x-request-id"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_diagnostics: ContextVar[bool] = ContextVar("diagnostics", default=False)
+
+def diagnostics_enabled() -> bool:
+    """True when the current request asked for verbose diagnostic logs.
+
+    Call sites check this before building the log message, so requests
+    without the debug header pay nothing for diagnostics.
+    """
+    return _diagnostics.get()
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        category, rate = item.split("=", 1)
+        rates[category.strip()] = float(rate)
+    return rates
+
+def record_category(record: logging.LogRecord) -> str:
+    return getattr(record, "category", None) or record.name
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "category": record_category(record),
+            "message": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        data = getattr(record, "data", None)
+        if data is not None:
+            entry["data"] = data
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """Queue handler that does only the cheap work on the calling thread.
+
+    It stamps the request id, samples INFO and DEBUG records per category,
+    and truncates long messages and payloads. JSON encoding and the write
+    to the stream happen on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, sample_rates: Dict[str, float], max_chars: int):
+        super().__init__(log_queue)
+        self.sample_rates = sample_rates
+        self.max_chars = max_chars
+
+    def _truncate(self, text: str) -> str:
+        if self.max_chars and len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [truncated {len(text) - self.max_chars} chars]"
+        return text
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and self.sample_rates:
+            rate = self.sample_rates.get(record_category(record))
+            if rate is not None and random.random() >= rate:
+                return False
+        return super().filter(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = _request_id.get()
+        record.msg = self._truncate(record.getMessage())
+        record.args = None
+        data = getattr(record, "data", None)
+        if data is not None:
+            encoded = json.dumps(data, ensure_ascii=False, default=str)
+            if self.max_chars and len(encoded) > self.max_chars:
+                record.data = self._truncate(encoded)
+        if record.exc_info:
+            record.exc_text = self._truncate("".join(traceback.format_exception(*record.exc_info)))
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = "INFO", log_format: str = "json", sample_rates: Dict[str, float] = None, max_chars: int = 2000) -> QueueListener:
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    output = logging.StreamHandler()
+    output.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, output, respect_handler_level=False)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(RequestQueueHandler(log_queue, sample_rates or {}, max_chars))
+    root.setLevel(level.upper())
+    return listener
+
+
+class RequestContextMiddleware:
+    """Tags each request's logs with a request id (taken from X-Request-ID
+    when the client sends one) and turns on diagnostic logs for requests
+    whose X-Debug-Log header carries ``debug_token``. Without a token the
+    header is ignored, so clients can't make the server log their documents.
+    """
+
+    def __init__(self, app, debug_token: Optional[str] = None):
+        self.app = app
+        self.debug_token = debug_token
+
+    def _debug_requested(self, value: Optional[bytes]) -> bool:
+        if not value or not self.debug_token:
+            return False
+        return hmac.compare_digest(value.decode("latin-1").strip(), self.debug_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        id_token = _request_id.set(request_id)
+        debug_token = _diagnostics.set(self._debug_requested(headers.get(DEBUG_HEADER)))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_id.reset(id_token)
+            _diagnostics.reset(debug_token)
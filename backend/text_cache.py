@@ -0,0 +1,137 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from serialization import dump_file, load_file
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractedTextCache:
+    """Persistent cache of text extracted from uploaded documents.
+
+    Keys are derived from the SHA-256 of the raw file bytes, so re-uploading
+    the same file skips extraction no matter which endpoint receives it. Each
+    entry records how long the original extraction took; that time is added
+    to ``time_saved_seconds`` on every hit. Entries are evicted
+    least-recently-used once their total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.time_saved = 0.0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(file_sha256: str, variant: str) -> str:
+        return f"{file_sha256}-{variant}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filename[:-len(".json")], stat.st_size))
+
+        # mtime is refreshed on every hit, so it doubles as the LRU order.
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+
+        with self._lock:
+            self._evict_overflow()
+
+        logger.info(f"Extracted text cache loaded {len(self._index)} entries ({self.total_bytes} bytes) from {self.directory}")
+
+    def _remove(self, key: str):
+        self.total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_overflow(self):
+        while self.total_bytes > self.max_bytes and self._index:
+            oldest_key = next(iter(self._index))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+            filepath = self._path(key)
+            try:
+                entry = load_file(filepath)
+                os.utime(filepath)
+            except Exception as e:
+                logger.warning(f"Dropping unreadable extracted text cache entry {key}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._index.move_to_end(key)
+            self.hits += 1
+            self.time_saved += entry["extract_seconds"]
+            logger.info(f"Extracted text cache hit for {key[:12]}, saved {entry['extract_seconds']:.2f}s of extraction")
+            return entry["text"]
+
+    def set(self, key: str, text: str, extract_seconds: float):
+        with self._lock:
+            filepath = self._path(key)
+            tmp_path = f"{filepath}.tmp"
+            try:
+                dump_file(tmp_path, {"created_at": time.time(), "extract_seconds": extract_seconds, "text": text})
+                os.replace(tmp_path, filepath)
+                size = os.path.getsize(filepath)
+            except Exception as e:
+                logger.error(f"Error writing extracted text cache entry {key}: {e}")
+                return
+
+            self.total_bytes += size - self._index.get(key, 0)
+            self._index[key] = size
+            self._index.move_to_end(key)
+            self._evict_overflow()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "time_saved_seconds": round(self.time_saved, 3)
+        }
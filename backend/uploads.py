@@ -0,0 +1,104 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import BinaryIO, Dict, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Room for the multipart boundaries, part headers and small form fields.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def size_limit_detail(max_bytes: int) -> str:
+    return f"File size exceeds {max_bytes // (1024 * 1024)}MB limit"
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+def _copy_upload(source: BinaryIO, path: str, max_bytes: int) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as out:
+        while True:
+            chunk = source.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=size_limit_detail(max_bytes))
+            out.write(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+async def spool_upload(file: UploadFile, directory: Optional[str], max_bytes: int) -> SpooledUpload:
+    """Copy an upload to a temp file in fixed-size chunks, hashing it on the way.
+
+    The copy runs in a worker thread, reading Starlette's own spooled copy of
+    the part directly. Only one chunk is held in memory at a time, and the
+    copy stops as soon as the limit is passed instead of after the whole file
+    has been read.
+    """
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".upload")
+    os.close(fd)
+    try:
+        size, sha256 = await asyncio.to_thread(_copy_upload, file.file, path, max_bytes)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    logger.info(f"Spooled upload {file.filename} ({size} bytes) to {path}")
+    return SpooledUpload(path, size, sha256)
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects multipart requests over the upload limit. A declared
+    Content-Length is checked before any of the body is received; otherwise
+    (chunked uploads) body bytes are counted as they arrive, and the request
+    fails with a 413 as soon as the limit is passed.
+    ``path_limits`` overrides the limit for endpoints that take several files.
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"], self.max_bytes)
+        limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            logger.warning(f"Rejecting {content_length.decode()} byte upload before reading body")
+            response = JSONResponse(status_code=413, content={"detail": size_limit_detail(max_bytes)})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the form parser, so the route answers with a 413.
+                    logger.warning(f"Rejecting upload after {received} bytes of body")
+                    raise HTTPException(status_code=413, detail=size_limit_detail(max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)